@@ -14,8 +14,16 @@ import threading
 import queue
 import time
 import io # Needed for Popen output handling
+import uuid   # Stable job IDs
+import fnmatch
+import sqlite3  # Spilled file manifests for the streaming engine
+import tarfile  # Archive format for the streaming engine
+import cProfile # For per-job profiling
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
 import winreg # For Windows startup registry
 import sys    # For executable path and sys.argv
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler # For the optional metrics endpoint
 
 # --- Attempt to import Scheduling & Tray libraries ---
 try:
@@ -75,6 +83,97 @@ logging.basicConfig(
 )
 logging.info(f"Application Starting Up... Executable: {sys.executable}, Script: {os.path.abspath(sys.argv[0])}")
 
+# ==============================================================================
+# 1.5 TRACING & PROFILING
+# ==============================================================================
+# Stage timings are written as JSON lines to a size-rotated trace file, separate
+# from the human-readable debug log. Each run also leaves a JSON run record (and,
+# if requested, a profile) in Debug/Runs.
+TRACE_FILE = os.path.join(LOG_DIR, "backup_suite_trace.jsonl")
+RUNS_DIR = os.path.join(LOG_DIR, "Runs")
+os.makedirs(RUNS_DIR, exist_ok=True)
+PROFILE_MODES = ["off", "cprofile", "sampling"]
+SAMPLING_INTERVAL_SECONDS = 0.005
+
+trace_logger = logging.getLogger("backup_suite.trace")
+trace_logger.setLevel(logging.INFO)
+trace_logger.propagate = False
+_trace_handler = RotatingFileHandler(TRACE_FILE, maxBytes=5 * 1024 * 1024, backupCount=5, encoding='utf-8')
+_trace_handler.setFormatter(logging.Formatter('%(message)s'))
+trace_logger.addHandler(_trace_handler)
+
+@contextmanager
+def trace_span(job_name, stage, run_record=None, **attrs):
+    """Times the enclosed block and writes it to the trace file as one JSON line.
+    The yielded dict can be filled with extra fields (exit codes, ok flags)."""
+    span = {"ok": True}
+    started_at = datetime.now()
+    start = time.perf_counter()
+    try:
+        yield span
+    except BaseException as e:
+        span["ok"] = False; span["error"] = repr(e)
+        raise
+    finally:
+        duration_ms = round((time.perf_counter() - start) * 1000, 3)
+        event = {"ts": started_at.isoformat(timespec='milliseconds'), "job": job_name, "stage": stage,
+                 "duration_ms": duration_ms, "thread": threading.current_thread().name}
+        event.update(attrs); event.update(span)
+        try: trace_logger.info(json.dumps(event, default=str))
+        except Exception as e: logging.error(f"Failed to write trace event for '{job_name}/{stage}': {e}")
+        if run_record is not None:
+            run_record["stages"].append({k: v for k, v in event.items() if k not in ("job", "thread")})
+
+class SamplingProfiler:
+    """Low-overhead statistical profiler: a helper thread periodically captures the
+    target thread's stack. Output is in 'collapsed stack' format (one 'a;b;c count'
+    line per distinct stack), which flamegraph tools read directly."""
+    def __init__(self, target_thread_id, interval=SAMPLING_INTERVAL_SECONDS):
+        self.target_thread_id = target_thread_id
+        self.interval = interval
+        self.samples = {}
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name=f"Sampler-{target_thread_id}")
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.target_thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                key = ";".join(reversed(stack))
+                self.samples[key] = self.samples.get(key, 0) + 1
+
+    def start(self): self._thread.start()
+
+    def stop(self):
+        self._stop_event.set(); self._thread.join(timeout=5)
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in sorted(self.samples.items(), key=lambda item: -item[1]):
+                f.write(f"{stack} {count}\n")
+
+def new_run_record(job_details):
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    return {"job": job_details['name'], "job_id": job_details.get('id'), "run_id": f"{job_details['name']}_{timestamp}", "timestamp": timestamp,
+            "started_at": datetime.now().isoformat(timespec='seconds'), "finished_at": None,
+            "engine": job_details.get('engine', 'classic'),
+            "profile": job_details.get('profile', 'off'), "profile_path": None,
+            "success": False, "stages": []}
+
+def save_run_record(run_record, log_queue):
+    path = os.path.join(RUNS_DIR, f"{run_record['run_id']}.json")
+    try:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(run_record, f, indent=2, default=str)
+        logging.info(f"Run record saved: {path}")
+    except Exception as e:
+        log_queue.put(f"[{run_record['job']}] WARNING: Could not save run record: {e}")
+
 
 # ==============================================================================
 # 2. CONFIGURATION MANAGEMENT
@@ -82,13 +181,21 @@ logging.info(f"Application Starting Up... Executable: {sys.executable}, Script:
 CONFIG_DIR = "Settings"
 CONFIG_FILE = "backup_config.json"
 CONFIG_PATH = os.path.join(CONFIG_DIR, CONFIG_FILE)
+# Every job/settings change is appended (and fsynced) here before the config snapshot is
+# rewritten; entries newer than the snapshot's "journal_seq" are replayed on load.
+CONFIG_JOURNAL_PATH = os.path.join(CONFIG_DIR, "backup_config.journal")
+CONFIG_JOURNAL_MAX_BYTES = 1024 * 1024
+DEFAULT_METRICS_PORT = 9187
 
 def get_default_config():
     return {
         "global_settings": {
             "default_volumes_to_keep": 3,
             "default_backup_base_name": "Backups_Py",
-            "theme": "Light (Default)"
+            "theme": "Light (Default)",
+            "metrics_enabled": False,
+            "metrics_bind_address": "127.0.0.1",
+            "metrics_port": DEFAULT_METRICS_PORT
         },
         "backup_jobs": []
     }
@@ -98,17 +205,20 @@ def load_config():
     if not os.path.exists(CONFIG_PATH):
         logging.warning("Configuration file not found. Creating a default one.")
         config_data = get_default_config()
+        _set_aside_config_journal()
         save_config(config_data)
         return config_data
     else:
         try:
             with open(CONFIG_PATH, 'r') as f:
                 config_data = json.load(f)
-                if "theme" not in config_data.get("global_settings", {}):
-                    config_data["global_settings"]["theme"] = "Light (Default)"
-                    save_config(config_data)
-                logging.info("Configuration loaded successfully.")
-                return config_data
+            replayed = replay_config_journal(config_data)
+            if replayed: logging.warning(f"Replayed {replayed} journaled change(s) missing from {CONFIG_PATH}.")
+            missing_theme = "theme" not in config_data.get("global_settings", {})
+            if missing_theme: config_data["global_settings"]["theme"] = "Light (Default)"
+            if replayed or missing_theme: save_config(config_data)
+            logging.info("Configuration loaded successfully.")
+            return config_data
         except (json.JSONDecodeError, IOError) as e:
             logging.error(f"Error loading/decoding {CONFIG_PATH}: {e}. Backing up and creating default.")
             if os.path.exists(CONFIG_PATH):
@@ -119,21 +229,144 @@ def load_config():
                 except OSError as e_rename:
                     logging.error(f"Could not rename corrupted config: {e_rename}")
             config_data = get_default_config()
+            _set_aside_config_journal()
             save_config(config_data)
             return config_data
 
 def save_config(config_data):
+    """Writes the config snapshot atomically: a fsynced temp file replaces the old one in a single step."""
     logging.info(f"Saving configuration to: {CONFIG_PATH}")
     try:
         os.makedirs(CONFIG_DIR, exist_ok=True)
-        with open(CONFIG_PATH, 'w') as f:
+        tmp_path = f"{CONFIG_PATH}.tmp"
+        with open(tmp_path, 'w') as f:
             json.dump(config_data, f, indent=4)
+            f.flush(); os.fsync(f.fileno())
+        os.replace(tmp_path, CONFIG_PATH)
         logging.info("Configuration saved successfully.")
         return True
     except Exception as e:
         logging.error(f"Failed to save config: {e}")
         return False
 
+def _set_aside_config_journal():
+    # A fresh config restarts journal_seq at 0, so entries from an older journal must not be replayed into it.
+    for path in (CONFIG_JOURNAL_PATH, f"{CONFIG_JOURNAL_PATH}.1"):
+        if os.path.exists(path):
+            try: os.replace(path, f"{path}.bak_{datetime.now().strftime('%Y%m%d%H%M%S')}")
+            except OSError as e: logging.error(f"Could not set aside config journal {path}: {e}")
+
+def append_config_journal(config_data, op, **payload):
+    """Durably records one change before the snapshot is rewritten, and bumps config_data's journal_seq."""
+    seq = config_data.get("journal_seq", 0) + 1
+    entry = {"seq": seq, "ts": datetime.now().isoformat(timespec='seconds'), "op": op}
+    entry.update(payload)
+    os.makedirs(CONFIG_DIR, exist_ok=True)
+    if os.path.exists(CONFIG_JOURNAL_PATH) and os.path.getsize(CONFIG_JOURNAL_PATH) > CONFIG_JOURNAL_MAX_BYTES:
+        os.replace(CONFIG_JOURNAL_PATH, f"{CONFIG_JOURNAL_PATH}.1")
+    with open(CONFIG_JOURNAL_PATH, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry) + "\n")
+        f.flush(); os.fsync(f.fileno())
+    config_data["journal_seq"] = seq
+
+def _apply_journal_entry(config_data, entry):
+    jobs = config_data.setdefault("backup_jobs", [])
+    op = entry.get("op")
+    if op == "add" and not any(j.get("id") == entry["job"]["id"] for j in jobs): jobs.append(entry["job"])
+    elif op == "update": config_data["backup_jobs"] = [entry["job"] if j.get("id") == entry["job"]["id"] else j for j in jobs]
+    elif op == "remove": config_data["backup_jobs"] = [j for j in jobs if j.get("id") != entry["job_id"]]
+    elif op == "settings": config_data["global_settings"] = entry["global_settings"]
+
+def replay_config_journal(config_data):
+    """Applies journal entries newer than the snapshot (a crash between journal append and
+    snapshot write). Returns the number of entries applied."""
+    snapshot_seq = config_data.get("journal_seq", 0)
+    applied = 0
+    for path in (f"{CONFIG_JOURNAL_PATH}.1", CONFIG_JOURNAL_PATH):
+        if not os.path.exists(path): continue
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try: entry = json.loads(line)
+                except ValueError: continue # Torn final line from a crash mid-append
+                if entry.get("seq", 0) <= snapshot_seq: continue
+                _apply_journal_entry(config_data, entry)
+                snapshot_seq = entry["seq"]; applied += 1
+    config_data["journal_seq"] = snapshot_seq
+    return applied
+
+CONFIG_SNAPSHOT_WARNING = "The change was saved to the config journal, but backup_config.json could not be rewritten. It will be applied from the journal on next start."
+
+class JobRegistry:
+    """In-memory index over config_data['backup_jobs'] keyed by each job's stable 'id'.
+    All job edits go through here so the journal, the config snapshot and the indexes stay in step.
+    Job dicts are replaced, never mutated, so running backups keep a consistent copy.
+    A change is committed once it is journaled: if the snapshot rewrite then fails, the change
+    stays in memory (replayed from the journal on next start) and snapshot_ok is set False."""
+    def __init__(self, config_data):
+        self.config = config_data
+        self.snapshot_ok = True
+        self._by_id = {}; self._by_name = {}; self._position = {}
+        jobs = config_data.setdefault('backup_jobs', [])
+        missing = [job for job in jobs if not job.get('id')]
+        for job in missing: job['id'] = uuid.uuid4().hex
+        self._reindex()
+        if missing:
+            logging.info(f"Assigned stable IDs to {len(missing)} job(s).")
+            save_config(config_data)
+
+    def _reindex(self, start=0, stop=None):
+        jobs = self.config['backup_jobs']
+        for i in range(start, len(jobs) if stop is None else stop):
+            job = jobs[i]
+            self._by_id[job['id']] = job; self._by_name[job['name']] = job; self._position[job['id']] = i
+
+    def _save_snapshot(self):
+        self.snapshot_ok = save_config(self.config)
+        if not self.snapshot_ok: logging.warning("Config change is journaled but the snapshot was not rewritten; it will be replayed on next start.")
+
+    def jobs(self): return list(self.config['backup_jobs'])
+    def get(self, job_id): return self._by_id.get(job_id)
+    def find_by_name(self, name): return self._by_name.get(name)
+    def position(self, job_id): return self._position.get(job_id)
+
+    def add(self, details):
+        details = dict(details, id=uuid.uuid4().hex)
+        try: append_config_journal(self.config, "add", job=details)
+        except Exception as e: logging.error(f"Failed to journal new job: {e}"); return None
+        self.config['backup_jobs'].append(details)
+        self._reindex(len(self.config['backup_jobs']) - 1)
+        self._save_snapshot()
+        return details
+
+    def update(self, job_id, details):
+        details = dict(details, id=job_id)
+        position = self._position[job_id]
+        try: append_config_journal(self.config, "update", job=details)
+        except Exception as e: logging.error(f"Failed to journal job update: {e}"); return None
+        old = self.config['backup_jobs'][position]
+        if self._by_name.get(old['name']) is old: del self._by_name[old['name']]
+        self.config['backup_jobs'][position] = details
+        self._reindex(position, position + 1)
+        self._save_snapshot()
+        return details
+
+    def remove(self, job_id):
+        position = self._position[job_id]
+        try: append_config_journal(self.config, "remove", job_id=job_id)
+        except Exception as e: logging.error(f"Failed to journal job removal: {e}"); return False
+        job = self.config['backup_jobs'].pop(position)
+        del self._by_id[job_id]; del self._position[job_id]
+        if self._by_name.get(job['name']) is job: del self._by_name[job['name']]
+        self._reindex(position)
+        self._save_snapshot()
+        return True
+
+    def save_settings(self):
+        try: append_config_journal(self.config, "settings", global_settings=self.config['global_settings'])
+        except Exception as e: logging.error(f"Failed to journal settings change: {e}"); return False
+        self._save_snapshot()
+        return True
+
 # ==============================================================================
 # 2.5 WINDOWS STARTUP REGISTRY FUNCTIONS (Unchanged)
 # ==============================================================================
@@ -196,32 +429,46 @@ def check_if_in_startup():
         return False
 
 # ==============================================================================
-# 3. CORE BACKUP LOGIC (Unchanged)
+# 3. CORE BACKUP LOGIC
 # ==============================================================================
-def read_subprocess_output(process, log_queue, job_name):
+def read_subprocess_output(process, log_queue, job_name, copy_stats=None):
+    throttle = ProgressThrottle()
     try:
         with io.TextIOWrapper(process.stdout, encoding='cp437', errors='replace') as stdout_reader:
             for line in iter(stdout_reader.readline, ''):
-                line = line.strip()
-                if line:
+                line = line.rstrip('\r\n')
+                if line.strip():
+                    # Robocopy file lines are tab-separated: <status> <size in bytes> <path>
                     if line.startswith('\t'):
-                        parts = line.split('\t')
-                        file_info = next((part for part in parts if part.strip()), None)
-                        if file_info:
-                            log_queue.put(("file_update", job_name, file_info.strip()))
+                        parts = [part.strip() for part in line.split('\t') if part.strip()]
+                        if parts and throttle.ready():
+                            log_queue.put(("file_update", job_name, parts[-1]))
+                        if copy_stats is not None and len(parts) >= 2 and parts[-2].isdigit():
+                            copy_stats["files"] += 1
+                            copy_stats["bytes"] += int(parts[-2])
     except Exception as e:
         log_queue.put(f"[{job_name}] ERROR reading Robocopy output: {e}")
     finally:
         log_queue.put(f"[{job_name}] Robocopy output reader finished.")
 
-def run_file_copy(job_details, temp_dest_dir, log_queue):
+def parse_rsync_stats(output, copy_stats):
+    for line in output.splitlines():
+        key, _, value = line.partition(':')
+        digits = value.strip().split(' ')[0].replace(',', '')
+        if not digits.isdigit(): continue
+        if key.strip() == "Number of regular files transferred": copy_stats["files"] = int(digits)
+        elif key.strip() == "Total transferred file size": copy_stats["bytes"] = int(digits)
+
+def run_file_copy(job_details, temp_dest_dir, log_queue, copy_stats=None):
     """
     Handles file copying, automatically choosing between Robocopy for standard
-    Windows paths and rsync (via WSL) for WSL paths.
+    Windows paths and rsync (via WSL) for WSL paths. If a copy_stats dict is
+    given, its "files" and "bytes" counters are filled from the tool's output.
     """
     source_dir = job_details['source_dir']
     job_name = job_details['name']
     exclusions = job_details.get('exclusions', [])
+    if copy_stats is None: copy_stats = {"files": 0, "bytes": 0}
 
     # --- WSL Path Detection ---
     is_wsl_path = source_dir.lower().startswith('\\\\wsl')
@@ -248,7 +495,7 @@ def run_file_copy(job_details, temp_dest_dir, log_queue):
         if not source_linux.endswith('/'):
             source_linux += '/'
 
-        command = ["wsl", "-d", distro_name, "rsync", "-av", source_linux, temp_dest_linux]
+        command = ["wsl", "-d", distro_name, "rsync", "-av", "--stats", source_linux, temp_dest_linux]
         # rsync exclusions are different from robocopy
         for exclusion in exclusions:
             command.append(f"--exclude={exclusion}")
@@ -256,8 +503,11 @@ def run_file_copy(job_details, temp_dest_dir, log_queue):
         log_queue.put(f"[{job_name}]   Executing: {' '.join(command)}")
         try:
             # For WSL/rsync, we can use subprocess.run as output is less verbose
-            process = subprocess.run(command, capture_output=True, text=True, check=False, creationflags=subprocess.CREATE_NO_WINDOW)
+            with trace_span(job_name, "subprocess_wait", command="rsync") as span:
+                process = subprocess.run(command, capture_output=True, text=True, check=False, creationflags=subprocess.CREATE_NO_WINDOW)
+                span["exit_code"] = process.returncode
             return_code = process.returncode
+            parse_rsync_stats(process.stdout, copy_stats)
             log_queue.put(f"[{job_name}]   rsync finished with Exit Code: {return_code}")
             if return_code != 0:
                 log_queue.put(f"[{job_name}]   rsync stderr: {process.stderr.strip()}")
@@ -277,11 +527,13 @@ def run_file_copy(job_details, temp_dest_dir, log_queue):
         try:
             process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
                                        creationflags=subprocess.CREATE_NO_WINDOW)
-            reader_thread = threading.Thread(target=read_subprocess_output, args=(process, log_queue, job_name),
+            reader_thread = threading.Thread(target=read_subprocess_output, args=(process, log_queue, job_name, copy_stats),
                                              daemon=True, name=f"RoboRead-{job_name}")
             reader_thread.start()
-            process.wait()
-            reader_thread.join(timeout=5)
+            with trace_span(job_name, "subprocess_wait", command="robocopy") as span:
+                process.wait()
+                reader_thread.join(timeout=5)
+                span["exit_code"] = process.returncode
             return_code = process.returncode
             log_queue.put(f"[{job_name}]   Robocopy finished with Exit Code: {return_code}")
             return return_code
@@ -320,7 +572,9 @@ def create_zip_archive(job_details, source_dir, zip_file_path, log_queue):
         
         log_queue.put(f"[{job_name}]   Executing WSL command...")
         try:
-            process = subprocess.run(command, capture_output=True, text=True, check=False, creationflags=subprocess.CREATE_NO_WINDOW)
+            with trace_span(job_name, "subprocess_wait", command="wsl zip") as span:
+                process = subprocess.run(command, capture_output=True, text=True, check=False, creationflags=subprocess.CREATE_NO_WINDOW)
+                span["exit_code"] = process.returncode
             return_code = process.returncode
             log_queue.put(f"[{job_name}]   WSL/zip finished with Exit Code: {return_code}")
             if return_code != 0:
@@ -343,7 +597,9 @@ def create_zip_archive(job_details, source_dir, zip_file_path, log_queue):
         command = ["powershell", "-NoProfile", "-ExecutionPolicy", "Bypass", "-Command", command_str]
         log_queue.put(f"[{job_name}]   Executing PowerShell...")
         try:
-            process = subprocess.run(command, capture_output=True, text=True, check=False, creationflags=subprocess.CREATE_NO_WINDOW)
+            with trace_span(job_name, "subprocess_wait", command="powershell Compress-Archive") as span:
+                process = subprocess.run(command, capture_output=True, text=True, check=False, creationflags=subprocess.CREATE_NO_WINDOW)
+                span["exit_code"] = process.returncode
             return_code = process.returncode
             log_queue.put(f"[{job_name}]   PowerShell Exit Code: {return_code}")
             if process.stderr: log_queue.put(f"[{job_name}]   PowerShell StdErr: {process.stderr.strip()}")
@@ -382,7 +638,9 @@ def cleanup_temp_dir(job_details, temp_dir, log_queue):
         command = ["wsl", "-d", distro_name, "rm", "-rf", temp_dir_linux]
         log_queue.put(f"[{job_name}]   Executing WSL command...")
         try:
-            process = subprocess.run(command, capture_output=True, text=True, check=False, creationflags=subprocess.CREATE_NO_WINDOW)
+            with trace_span(job_name, "subprocess_wait", command="wsl rm") as span:
+                process = subprocess.run(command, capture_output=True, text=True, check=False, creationflags=subprocess.CREATE_NO_WINDOW)
+                span["exit_code"] = process.returncode
             if process.returncode == 0:
                 log_queue.put(f"[{job_name}]   Temp folder deleted via WSL.")
                 return True
@@ -405,53 +663,635 @@ def cleanup_temp_dir(job_details, temp_dir, log_queue):
             log_queue.put(f"[{job_name}] ERROR: Failed to delete temp folder: {e}")
             return False
 
+# ==============================================================================
+# 3.5 STREAMING ENGINE (Constant Memory)
+# ==============================================================================
+# The "streaming" engine replaces the Robocopy -> temp folder -> Compress-Archive
+# pipeline with a lazy scan feeding a .tar.gz writer through a bounded queue.
+# Nothing proportional to the number of files is held in memory: the scan keeps
+# one directory iterator per level, the queue blocks the scanner when the writer
+# falls behind, and the file manifest is spilled to SQLite in batches. The queue
+# carries only entry metadata; file data is read by the writer itself, or (in a
+# shared read pass) at most STREAM_BUFFER_CHUNKS chunks ahead of each writer.
+# (ZIP is not used here because zipfile keeps its whole central directory in memory.)
+ENGINES = ["classic", "streaming"]
+STREAM_QUEUE_SIZE = 256
+STREAM_CHUNK_SIZE = 1024 * 1024
+STREAM_BUFFER_CHUNKS = 8 # Per writer in a shared pass: chunks read from disk but not yet archived.
+# How long a writer waits for the rest of its group to join before the read pass starts.
+SHARED_PASS_START_TIMEOUT_SECONDS = 300
+MANIFEST_BATCH_SIZE = 1000
+PROGRESS_INTERVAL_SECONDS = 0.25
+RSS_SAMPLE_INTERVAL_SECONDS = 0.5
+_STREAM_DONE = object()
+
+class ProgressThrottle:
+    """Limits per-file UI messages to one per interval, so log_queue does not grow with the file count."""
+    def __init__(self, interval=PROGRESS_INTERVAL_SECONDS):
+        self.interval = interval
+        self._last = 0.0
+
+    def ready(self):
+        now = time.monotonic()
+        if now - self._last >= self.interval:
+            self._last = now; return True
+        return False
+
+def get_rss_bytes():
+    """Current resident set size (working set on Windows) of this process, or None if unavailable."""
+    try:
+        if sys.platform == "win32":
+            import ctypes
+            from ctypes import wintypes
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                            ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                            ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+            counters = PROCESS_MEMORY_COUNTERS(); counters.cb = ctypes.sizeof(counters)
+            if ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+                return counters.WorkingSetSize
+            return None
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        return None
+
+class PeakRssMonitor:
+    """Samples process RSS while a run is in progress and keeps the maximum seen."""
+    def __init__(self, interval=RSS_SAMPLE_INTERVAL_SECONDS):
+        self.interval = interval
+        self.peak = get_rss_bytes()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="RssMonitor")
+
+    def _sample(self):
+        rss = get_rss_bytes()
+        if rss is not None and (self.peak is None or rss > self.peak): self.peak = rss
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval): self._sample()
+
+    def start(self): self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread.ident is not None: self._thread.join(timeout=5)
+        self._sample()
+
+def is_excluded(name, rel_path, abs_path, exclusions):
+    """Matches a directory/file against job exclusions: a bare name or wildcard (node_modules, *.tmp),
+    a path relative to the source (build/cache), or an absolute path (as Robocopy's /XD accepts)."""
+    name = name.lower(); rel_path = rel_path.replace('\\', '/').lower()
+    for pattern in exclusions:
+        pattern_norm = pattern.replace('\\', '/').rstrip('/').lower()
+        if fnmatch.fnmatch(name, pattern_norm) or fnmatch.fnmatch(rel_path, pattern_norm): return True
+        if os.path.isabs(pattern) and os.path.normcase(os.path.abspath(pattern)) == os.path.normcase(abs_path): return True
+    return False
+
+def _norm_path(path):
+    return os.path.normcase(os.path.abspath(path))
+
+def _is_within(path_norm, root_norm):
+    prefix = root_norm if root_norm.endswith(os.sep) else root_norm + os.sep
+    return path_norm == root_norm or path_norm.startswith(prefix)
+
+def iter_shared_entries(root, targets, on_error):
+    """Lazily walks `root` once on behalf of several jobs, depth-first, holding only one open
+    directory iterator per level. `targets` is a list of (index, source_norm, exclusions), one per
+    job; each job's source must be `root` or lie below it. Yields
+    (abs_path, stat_result, is_dir, [(index, rel_path), ...]) for every entry that at least one job
+    includes, with rel_path relative to that job's source and its exclusions applied."""
+    root_norm = _norm_path(root)
+    active = [(index, "", exclusions) for index, source_norm, exclusions in targets if source_norm == root_norm]
+    pending = [target for target in targets if target[1] != root_norm]
+    stack = [(os.scandir(root), active, pending)]
+    try:
+        while stack:
+            iterator, active, pending = stack[-1]
+            entry = next(iterator, None)
+            if entry is None:
+                iterator.close(); stack.pop(); continue
+            try:
+                child_active = []
+                for index, rel_dir, exclusions in active:
+                    rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                    if not is_excluded(entry.name, rel_path, entry.path, exclusions):
+                        child_active.append((index, rel_path, exclusions))
+                if entry.is_dir(follow_symlinks=False):
+                    child_pending = []
+                    if pending:
+                        entry_norm = _norm_path(entry.path)
+                        for target in pending:
+                            if target[1] == entry_norm: child_active.append((target[0], "", target[2]))
+                            elif _is_within(target[1], entry_norm): child_pending.append(target)
+                    matches = [(index, rel_path) for index, rel_path, _ in child_active if rel_path]
+                    if matches: yield entry.path, entry.stat(follow_symlinks=False), True, matches
+                    if child_active or child_pending:
+                        stack.append((os.scandir(entry.path), child_active, child_pending))
+                elif child_active and entry.is_file():
+                    yield entry.path, entry.stat(), False, [(index, rel_path) for index, rel_path, _ in child_active]
+            except OSError as e:
+                on_error(entry.path, f"Skipping '{entry.path}': {e}")
+    finally:
+        for iterator, _, _ in stack: iterator.close()
+
+class _SizedReader:
+    """Reads exactly `size` bytes from a file that may change while it is being archived:
+    extra bytes are ignored and a short file is padded with zeros, so the tar stream stays valid."""
+    def __init__(self, fileobj, size):
+        self.fileobj = fileobj
+        self.remaining = size
+        self.truncated = False
+
+    def read(self, n=-1):
+        if n < 0 or n > self.remaining: n = self.remaining
+        try: data = self.fileobj.read(n) if n else b""
+        except OSError: data = b""
+        if len(data) < n:
+            self.truncated = True
+            data += b"\0" * (n - len(data))
+        self.remaining -= n
+        return data
+
+class _ChunkStream:
+    """File-like view over chunks pushed by the shared reader. tarfile asks for exact block sizes,
+    so chunks are re-sliced here. Each chunk taken returns one slot to the writer's read-ahead
+    budget, which is what bounds the file data in flight, however many files are queued."""
+    def __init__(self, budget):
+        self.chunks = queue.Queue()
+        self.budget = budget
+        self.aborted = False
+        self._buffer = bytearray()
+
+    def read(self, n):
+        while len(self._buffer) < n:
+            try:
+                self._buffer += self.chunks.get(timeout=0.5)
+                self.budget.release()
+            except queue.Empty:
+                if self.aborted: raise OSError("shared read pass ended before the file was complete")
+        data = bytes(self._buffer[:n]); del self._buffer[:n]
+        return data
+
+def manifest_path_for_archive(archive_path):
+    # Archives are named <run_id>.zip / <run_id>.tar.gz; the run's manifest lives in RUNS_DIR.
+    run_id = os.path.basename(archive_path)
+    for ext in (".tar.gz", ".zip"):
+        if run_id.endswith(ext): run_id = run_id[:-len(ext)]
+    return os.path.join(RUNS_DIR, f"{run_id}.manifest.sqlite")
+
+def remove_run_manifest(manifest_path):
+    try:
+        if manifest_path and os.path.exists(manifest_path): os.remove(manifest_path)
+    except OSError as e:
+        logging.warning(f"Could not remove manifest {manifest_path}: {e}")
+
+def open_manifest(manifest_path):
+    conn = sqlite3.connect(manifest_path)
+    conn.execute("PRAGMA journal_mode=OFF"); conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime REAL, is_dir INTEGER)")
+    return conn
+
+class ArchiveWriter:
+    """Writes one job's .tar.gz and SQLite manifest from a bounded queue of entries fed by a
+    SharedStreamPass. run() is executed on the job's own thread."""
+    def __init__(self, job_details, archive_path, manifest_path, log_queue, copy_stats):
+        self.job_details = job_details
+        self.job_name = job_details['name']
+        self.source_norm = _norm_path(job_details['source_dir'])
+        self.archive_path = archive_path
+        self.manifest_path = manifest_path
+        self.log_queue = log_queue
+        self.copy_stats = copy_stats
+        self.items = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+        self.budget = threading.Semaphore(STREAM_BUFFER_CHUNKS)
+        self.reader = None # Set by SharedStreamPass when its read thread starts
+        self.failed = False
+
+    def warn(self, message):
+        self.log_queue.put(f"[{self.job_name}]   WARNING: {message}")
+
+    def _offer(self, target_queue, item):
+        # Blocking put (backpressure) that gives up once this writer has failed.
+        while not self.failed:
+            try: target_queue.put(item, timeout=0.5); return True
+            except queue.Full: continue
+        return False
+
+    def put(self, item): return self._offer(self.items, item)
+
+    def put_chunk(self, stream, data):
+        # Waits for read-ahead budget (freed as this writer consumes chunks), giving up once it has failed.
+        while not self.failed:
+            if self.budget.acquire(timeout=0.5):
+                stream.chunks.put(data); return True
+        return False
+
+    def _next_item(self):
+        # Never blocks forever: fails if the read pass does not start, or ends without finishing the queue.
+        deadline = time.monotonic() + SHARED_PASS_START_TIMEOUT_SECONDS
+        while True:
+            try: return self.items.get(timeout=0.5)
+            except queue.Empty:
+                reader = self.reader
+                if reader is None and time.monotonic() > deadline:
+                    raise RuntimeError("shared read pass did not start (another job in the group never joined)")
+                if reader is not None and not reader.is_alive() and self.items.empty():
+                    raise RuntimeError("shared read pass ended before the archive was complete")
+
+    def run(self):
+        throttle = ProgressThrottle()
+        manifest = None
+        batch = []
+        try:
+            manifest = open_manifest(self.manifest_path)
+            with tarfile.open(self.archive_path, "w:gz", compresslevel=6) as tar:
+                while True:
+                    item = self._next_item()
+                    if item is _STREAM_DONE: break
+                    rel_path, st, is_dir, source = item
+                    tarinfo = tarfile.TarInfo(rel_path)
+                    tarinfo.mtime = int(st.st_mtime)
+                    if is_dir:
+                        tarinfo.type = tarfile.DIRTYPE; tarinfo.mode = 0o755
+                        tar.addfile(tarinfo)
+                    else:
+                        tarinfo.size = st.st_size; tarinfo.mode = 0o644
+                        if isinstance(source, _ChunkStream): tar.addfile(tarinfo, source)
+                        else:
+                            try:
+                                with open(source, 'rb') as f:
+                                    sized = _SizedReader(f, st.st_size)
+                                    tar.addfile(tarinfo, sized)
+                                if sized.truncated: self.warn(f"'{rel_path}' shrank while being archived; padded with zeros.")
+                            except OSError as e:
+                                self.warn(f"Could not read '{source}': {e}"); continue
+                        self.copy_stats["files"] += 1; self.copy_stats["bytes"] += st.st_size
+                        if throttle.ready(): self.log_queue.put(("file_update", self.job_name, rel_path))
+                    # TarFile keeps a TarInfo per member for reading back; nothing reads it while writing.
+                    tar.members.clear()
+                    batch.append((rel_path, 0 if is_dir else st.st_size, st.st_mtime, int(is_dir)))
+                    if len(batch) >= MANIFEST_BATCH_SIZE:
+                        manifest.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)", batch); manifest.commit(); batch.clear()
+            if batch:
+                manifest.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)", batch); manifest.commit()
+            return True
+        except Exception as e:
+            self.failed = True
+            self.log_queue.put(f"[{self.job_name}] CRITICAL ERROR during streaming archive: {e}")
+            try: os.remove(self.archive_path)
+            except OSError: pass
+            return False
+        finally:
+            if manifest: manifest.close()
+            if self.failed: remove_run_manifest(self.manifest_path)
+
+class SharedStreamPass:
+    """One scan and one read of the source tree shared by several streaming jobs whose sources
+    overlap (one contains the other). Each participating job thread calls stream(), which registers
+    its ArchiveWriter and then runs it; once every expected job has registered (or left via leave()),
+    a reader thread walks the common root and fans each file's data out to the interested writers,
+    with each job's own exclusions applied. A single job is simply a pass with one participant."""
+    def __init__(self, jobs, log_queue):
+        self.root = min((job['source_dir'] for job in jobs), key=lambda path: len(_norm_path(path)))
+        self.log_queue = log_queue
+        self.error = None
+        self._expected = {job['name'] for job in jobs}
+        self._writers = []
+        self._started = False
+        self._lock = threading.Lock()
+
+    def leave(self, job_name):
+        """Withdraws a job that will not stream (disabled, failed early), so the others are not kept waiting."""
+        with self._lock:
+            self._expected.discard(job_name)
+            self._maybe_start()
+
+    def _maybe_start(self):
+        if self._started or self._expected or not self._writers: return
+        self._started = True
+        names = ", ".join(writer.job_name for writer in self._writers)
+        if len(self._writers) > 1: self.log_queue.put(f"Shared read pass over '{self.root}' for: {names}")
+        reader = threading.Thread(target=self._read_pass, daemon=True, name=f"SharedRead-{os.path.basename(self.root)}")
+        reader.start()
+        for writer in self._writers: writer.reader = reader
+
+    def stream(self, job_details, archive_path, manifest_path, log_queue, copy_stats):
+        job_name = job_details['name']
+        if not os.path.isdir(job_details['source_dir']):
+            log_queue.put(f"[{job_name}] CRITICAL ERROR: Source directory not found: {job_details['source_dir']}")
+            self.leave(job_name); return False
+        writer = ArchiveWriter(job_details, archive_path, manifest_path, log_queue, copy_stats)
+        with self._lock:
+            joined = not self._started
+            if joined:
+                self._writers.append(writer)
+                self._expected.discard(job_name)
+                self._maybe_start()
+        if not joined:
+            log_queue.put(f"[{job_name}] Shared pass already running; reading source separately.")
+            return stream_archive(job_details, archive_path, manifest_path, log_queue, copy_stats)
+        ok = writer.run()
+        if self.error is not None:
+            log_queue.put(f"[{job_name}] CRITICAL ERROR during source scan: {self.error}"); return False
+        if ok: log_queue.put(f"[{job_name}] SUCCESS: Streamed {copy_stats['files']} files ({copy_stats['bytes']} bytes) to archive.")
+        return ok
+
+    def _read_pass(self):
+        writers = self._writers
+        targets = [(index, writer.source_norm, writer.job_details.get('exclusions', [])) for index, writer in enumerate(writers)]
+        def on_error(path, message):
+            path_norm = _norm_path(path)
+            for writer in writers:
+                if _is_within(path_norm, writer.source_norm): writer.warn(message)
+        try:
+            for abs_path, st, is_dir, matches in iter_shared_entries(self.root, targets, on_error):
+                if all(writer.failed for writer in writers): break
+                if is_dir:
+                    for index, rel_path in matches: writers[index].put((rel_path, st, True, None))
+                elif len(writers) == 1:
+                    # A lone job reads its own files on its writer thread, so nothing is read ahead.
+                    for index, rel_path in matches: writers[index].put((rel_path, st, False, abs_path))
+                else:
+                    self._fan_out_file(abs_path, st, [(writers[index], rel_path) for index, rel_path in matches])
+        except Exception as e:
+            self.error = e
+        finally:
+            for writer in writers: writer.put(_STREAM_DONE)
+
+    def _fan_out_file(self, abs_path, st, targets):
+        targets = [(writer, rel_path) for writer, rel_path in targets if not writer.failed]
+        try: f = open(abs_path, 'rb')
+        except OSError as e:
+            for writer, _ in targets: writer.warn(f"Could not read '{abs_path}': {e}")
+            return
+        streams = []
+        try:
+            with f:
+                for writer, rel_path in targets:
+                    stream = _ChunkStream(writer.budget)
+                    if writer.put((rel_path, st, False, stream)): streams.append((writer, stream))
+                # The tar header already promised st_size bytes: a file that shrinks mid-read is
+                # padded with zeros and extra bytes from a growing file are ignored.
+                remaining = st.st_size; truncated = False
+                while remaining > 0 and streams:
+                    n = min(STREAM_CHUNK_SIZE, remaining)
+                    try: data = f.read(n)
+                    except OSError: data = b""
+                    if len(data) < n:
+                        truncated = True; data += b"\0" * (n - len(data))
+                    remaining -= n
+                    streams = [(writer, stream) for writer, stream in streams if writer.put_chunk(stream, data)]
+            if truncated:
+                for writer, _ in streams: writer.warn(f"'{abs_path}' shrank while being archived; padded with zeros.")
+        except BaseException:
+            for _, stream in streams: stream.aborted = True
+            raise
+
+def stream_archive(job_details, archive_path, manifest_path, log_queue, copy_stats):
+    """Scans and archives a single job's source through a one-participant SharedStreamPass.
+    Returns True on success."""
+    log_queue.put(f"[{job_details['name']}] Starting streaming archive (queue size {STREAM_QUEUE_SIZE})...")
+    return SharedStreamPass([job_details], log_queue).stream(job_details, archive_path, manifest_path, log_queue, copy_stats)
+
+def group_overlapping_jobs(jobs):
+    """Groups enabled streaming jobs whose source directories overlap (one contains the other) so
+    they can share a read pass. Every other job ends up in a group of its own."""
+    groups = []
+    shareable = []
+    for job in jobs:
+        if job.get('enabled', False) and job.get('engine', 'classic') == 'streaming': shareable.append(job)
+        else: groups.append([job])
+    roots = []
+    for job in sorted(shareable, key=lambda j: len(_norm_path(j['source_dir']))):
+        source_norm = _norm_path(job['source_dir'])
+        for root_norm, group in roots:
+            if _is_within(source_norm, root_norm):
+                group.append(job); break
+        else:
+            roots.append((source_norm, [job]))
+    return groups + [group for _, group in roots]
+
+def start_backup_jobs(jobs, global_settings, log_queue):
+    """Starts one thread per job. Streaming jobs with overlapping sources that start together
+    share one SharedStreamPass, but each still writes its own archive, log and run record."""
+    for group in group_overlapping_jobs(jobs):
+        shared_pass = None
+        if len(group) > 1:
+            shared_pass = SharedStreamPass(group, log_queue)
+            log_queue.put(f"Jobs with overlapping sources will share one read pass: {', '.join(j['name'] for j in group)}")
+        for job in group:
+            threading.Thread(target=run_backup_job, args=(job, global_settings, log_queue, shared_pass),
+                             daemon=True, name=f"Backup-{job['name']}").start()
+
 def perform_cleanup(job_details, volumes_to_keep, log_queue):
     job_name = job_details['name']
     backup_folder = job_details['destination_base']
     log_queue.put(f"[{job_name}] Starting Backup Rotation Check...")
     log_queue.put(f"[{job_name}]   Folder: {backup_folder}, Keep: {volumes_to_keep}")
     search_pattern = os.path.join(backup_folder, f"{job_name}_*.zip")
-    log_queue.put(f"[{job_name}]   Searching with pattern: {search_pattern}")
+    stream_pattern = os.path.join(backup_folder, f"{job_name}_*.tar.gz")
+    log_queue.put(f"[{job_name}]   Searching with pattern: {search_pattern} (and .tar.gz)")
     try:
-        backup_files = sorted(glob.glob(search_pattern))
+        backup_files = sorted(glob.glob(search_pattern) + glob.glob(stream_pattern))
         backup_count = len(backup_files)
         log_queue.put(f"[{job_name}]   Found {backup_count} backups for this job.")
         if backup_count > volumes_to_keep:
             delete_count = backup_count - volumes_to_keep
             log_queue.put(f"[{job_name}]   Need to delete {delete_count} backups.")
+            deleted = []
             for file_path in backup_files[:delete_count]:
                 log_queue.put(f"[{job_name}]     Deleting: {os.path.basename(file_path)}")
-                try: os.remove(file_path)
+                try:
+                    os.remove(file_path)
+                    remove_run_manifest(manifest_path_for_archive(file_path))
+                    deleted.append(file_path)
                 except OSError as e: log_queue.put(f"[{job_name}]     WARNING: Delete failed: {e}")
+            mark_archives_pruned(deleted, job_name, log_queue)
         else: log_queue.put(f"[{job_name}]   No cleanup needed for this job.")
     except Exception as e: log_queue.put(f"[{job_name}] ERROR during cleanup search: {e}")
 
-def run_backup_job(job_details, global_settings, log_queue):
-    job_name = job_details['name']
-    total_steps = 4
-    def update_status(step, message=""): log_queue.put(("status", job_name, step, total_steps, message))
-    update_status(0, "Starting...")
-    if not job_details.get('enabled', False):
-        log_queue.put(f"[{job_name}] SKIPPED: Job is disabled.")
-        update_status(0, "Skipped (Disabled)"); return
+# ==============================================================================
+# 3.6 SNAPSHOT CATALOG & TIERED RETENTION
+# ==============================================================================
+# Successful runs are recorded in a SQLite catalog. Tiered (grandfather-father-son)
+# retention picks snapshots to keep from that metadata rather than from archive
+# filenames, and prunes in one batch: the victims are first marked 'pruning' in a
+# single transaction, then deleted, then marked 'pruned' in a second transaction.
+# A crash in between leaves 'pruning' rows that the next prune finishes.
+CATALOG_PATH = os.path.join(CONFIG_DIR, "backup_catalog.db")
+RETENTION_TIERS = ["last", "hourly", "daily", "weekly", "monthly"]
+_RETENTION_BUCKETS = {
+    "hourly": lambda dt: dt.strftime("%Y-%m-%d %H"),
+    "daily": lambda dt: dt.strftime("%Y-%m-%d"),
+    "weekly": lambda dt: "%d-W%02d" % dt.isocalendar()[:2],
+    "monthly": lambda dt: dt.strftime("%Y-%m"),
+}
 
-    backup_folder = job_details['destination_base']
+def catalog_connect():
+    os.makedirs(CONFIG_DIR, exist_ok=True)
+    conn = sqlite3.connect(CATALOG_PATH, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""CREATE TABLE IF NOT EXISTS snapshots (
+        run_id TEXT PRIMARY KEY, job TEXT NOT NULL, archive_path TEXT NOT NULL, manifest_path TEXT,
+        created_at TEXT NOT NULL, archive_bytes INTEGER, status TEXT NOT NULL DEFAULT 'kept', pruned_at TEXT)""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_snapshots_job_status ON snapshots (job, status)")
+    # job_id was added later; rows are matched to jobs by stable ID so renames keep their history.
+    if "job_id" not in [col[1] for col in conn.execute("PRAGMA table_info(snapshots)")]:
+        with conn: conn.execute("ALTER TABLE snapshots ADD COLUMN job_id TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_snapshots_job_id_status ON snapshots (job_id, status)")
+    return conn
+
+def _catalog_job_filter(job_details):
+    # Jobs always have an ID once loaded through JobRegistry; the name is only a fallback.
+    if job_details.get('id'): return "job_id = ?", job_details['id']
+    return "job = ?", job_details['name']
+
+def backfill_catalog_job_ids(jobs):
+    """Fills job_id on catalog rows recorded before snapshots carried it, matching by current job name."""
+    if not os.path.exists(CATALOG_PATH): return
+    try:
+        conn = catalog_connect()
+        try:
+            with conn:
+                filled = sum(conn.execute("UPDATE snapshots SET job_id = ? WHERE job_id IS NULL AND job = ?", (job['id'], job['name'])).rowcount
+                             for job in jobs if job.get('id'))
+        finally: conn.close()
+        if filled: logging.info(f"Linked {filled} catalog snapshot(s) to job IDs.")
+    except Exception as e:
+        logging.error(f"Could not backfill snapshot catalog job IDs: {e}")
 
-    job_specific_volumes = job_details.get("volumes_to_keep_override")
-    if job_specific_volumes is not None and job_specific_volumes > 0:
-        volumes_to_keep = job_specific_volumes
-        log_queue.put(f"[{job_name}] Using job-specific retention: {volumes_to_keep} backups.")
-    else:
-        volumes_to_keep = global_settings.get('default_volumes_to_keep', 3)
-        log_queue.put(f"[{job_name}] Using global retention (defaulting to {volumes_to_keep} backups).")
+def record_snapshot(run_record, log_queue):
+    try:
+        conn = catalog_connect()
+        try:
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO snapshots (run_id, job, job_id, archive_path, manifest_path, created_at, archive_bytes) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                             (run_record['run_id'], run_record['job'], run_record.get('job_id'), run_record['archive_path'], run_record.get('manifest_path'),
+                              run_record['started_at'], run_record.get('archive_bytes', 0)))
+        finally: conn.close()
+    except Exception as e:
+        log_queue.put(f"[{run_record['job']}] WARNING: Could not record snapshot in catalog: {e}")
 
-    os.makedirs(backup_folder, exist_ok=True)
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+def mark_archives_pruned(archive_paths, job_name, log_queue):
+    """Marks catalog rows for archives deleted outside apply_retention (legacy rotation) as pruned."""
+    if not archive_paths: return
+    try:
+        conn = catalog_connect()
+        try:
+            now = datetime.now().isoformat(timespec='seconds')
+            with conn:
+                conn.executemany("UPDATE snapshots SET status = 'pruned', pruned_at = ? WHERE archive_path = ? AND status != 'pruned'",
+                                 [(now, path) for path in archive_paths])
+        finally: conn.close()
+    except Exception as e:
+        log_queue.put(f"[{job_name}] WARNING: Could not update snapshot catalog: {e}")
+
+def parse_retention_spec(spec):
+    """Parses 'last=3, hourly=24, daily=7, weekly=4, monthly=12' into a dict. Empty means no tiers.
+    Raises ValueError on unknown tiers or non-positive counts."""
+    policy = {}
+    for part in spec.replace(';', ',').split(','):
+        if not part.strip(): continue
+        tier, sep, count = part.partition('=')
+        tier = tier.strip().lower()
+        if not sep or tier not in RETENTION_TIERS: raise ValueError(f"Unknown retention tier '{part.strip()}'.")
+        if not count.strip().isdigit() or int(count) < 1: raise ValueError(f"Count for '{tier}' must be a whole number >= 1.")
+        policy[tier] = int(count)
+    return policy
+
+def format_retention_spec(policy):
+    return ", ".join(f"{tier}={policy[tier]}" for tier in RETENTION_TIERS if policy and tier in policy)
+
+def get_retention_policy(job_details, global_settings):
+    """Tiered policy for a job, or None for the legacy 'keep newest N' rotation.
+    Precedence: job tiers, then job 'Backups to Keep', then global tiers."""
+    if job_details.get("retention"): return job_details["retention"]
+    if (job_details.get("volumes_to_keep_override") or 0) > 0: return None
+    return global_settings.get("default_retention") or None
+
+def select_snapshots_to_keep(snapshots, policy):
+    """GFS selection: keeps the newest `last` snapshots, plus the newest snapshot in each of the
+    most recent N hours/days/ISO weeks/months for each configured tier. `snapshots` is a list of
+    (run_id, created_at datetime) pairs; returns the set of run_ids to keep."""
+    newest_first = sorted(snapshots, key=lambda snap: snap[1], reverse=True)
+    keep = {run_id for run_id, _ in newest_first[:policy.get("last", 0)]}
+    for tier, bucket_of in _RETENTION_BUCKETS.items():
+        limit = policy.get(tier, 0)
+        seen = set()
+        for run_id, created_at in newest_first:
+            if len(seen) >= limit: break
+            bucket = bucket_of(created_at)
+            if bucket not in seen:
+                seen.add(bucket); keep.add(run_id)
+    return keep
+
+def plan_retention(job_details, policy):
+    """Returns (keep, prune) lists of catalog rows (run_id, archive_path, manifest_path, created_at)."""
+    job_clause, job_key = _catalog_job_filter(job_details)
+    conn = catalog_connect()
+    try:
+        rows = conn.execute(f"SELECT run_id, archive_path, manifest_path, created_at FROM snapshots WHERE {job_clause} AND status = 'kept'",
+                            (job_key,)).fetchall()
+    finally: conn.close()
+    # Archives deleted by hand still have 'kept' rows; they must not count toward a tier.
+    rows = [row for row in rows if os.path.exists(row[1])]
+    keep_ids = select_snapshots_to_keep([(row[0], datetime.fromisoformat(row[3])) for row in rows], policy)
+    keep = sorted((row for row in rows if row[0] in keep_ids), key=lambda row: row[3], reverse=True)
+    prune = sorted((row for row in rows if row[0] not in keep_ids), key=lambda row: row[3])
+    return keep, prune
+
+def apply_retention(job_details, policy, log_queue, dry_run=False):
+    """Prunes a job's snapshots down to the tiered policy as one batch. With dry_run=True only
+    logs and returns the plan. Returns (keep, prune) as planned."""
+    job_name = job_details['name']
+    log_queue.put(f"[{job_name}] Starting Tiered Retention ({format_retention_spec(policy)}){' [DRY RUN]' if dry_run else ''}...")
+    keep, prune = plan_retention(job_details, policy)
+    log_queue.put(f"[{job_name}]   Catalog: {len(keep) + len(prune)} snapshots, keeping {len(keep)}, pruning {len(prune)}.")
+    if dry_run:
+        for row in prune: log_queue.put(f"[{job_name}]     Would delete: {os.path.basename(row[1])}")
+        return keep, prune
+    conn = catalog_connect()
+    try:
+        with conn:
+            conn.executemany("UPDATE snapshots SET status = 'pruning' WHERE run_id = ? AND status = 'kept'", [(row[0],) for row in prune])
+        job_clause, job_key = _catalog_job_filter(job_details)
+        pending = conn.execute(f"SELECT run_id, archive_path, manifest_path FROM snapshots WHERE {job_clause} AND status = 'pruning'",
+                               (job_key,)).fetchall()
+        pruned = []
+        for run_id, archive_path, manifest_path in pending:
+            try:
+                for path in (archive_path, manifest_path):
+                    if path and os.path.exists(path): os.remove(path)
+                pruned.append(run_id)
+                log_queue.put(f"[{job_name}]     Deleted: {os.path.basename(archive_path)}")
+            except OSError as e:
+                log_queue.put(f"[{job_name}]     WARNING: Delete failed (will retry next run): {e}")
+        now = datetime.now().isoformat(timespec='seconds')
+        with conn:
+            conn.executemany("UPDATE snapshots SET status = 'pruned', pruned_at = ? WHERE run_id = ?", [(now, run_id) for run_id in pruned])
+    finally: conn.close()
+    return keep, prune
+
+def _run_classic_stages(job_details, backup_folder, log_queue, run_record, update_status):
+    """Robocopy/rsync into a temp folder, zip it, then remove the temp folder. Returns (copy_ok, zip_ok)."""
+    job_name = job_details['name']
+    timestamp = run_record['timestamp']
     temp_copy_dir = os.path.join(backup_folder, f"Temp_{job_name}_{timestamp}")
     zip_file = os.path.join(backup_folder, f"{job_name}_{timestamp}.zip")
 
     update_status(1, "Copying files...")
-    copy_exit_code = run_file_copy(job_details, temp_copy_dir, log_queue)
+    # Robocopy/rsync scan and copy in a single pass, so "copy" also covers the source scan.
+    copy_stats = {"files": 0, "bytes": 0}
+    with trace_span(job_name, "copy", run_record) as span:
+        copy_exit_code = run_file_copy(job_details, temp_copy_dir, log_queue, copy_stats)
+        span["exit_code"] = copy_exit_code
+        span.update(copy_stats)
+    run_record["copy_exit_code"] = copy_exit_code
+    run_record["files_processed"] = copy_stats["files"]
+    run_record["bytes_processed"] = copy_stats["bytes"]
 
     # Check for success. Robocopy is successful if exit code is < 8. rsync is successful if 0.
     is_wsl = job_details['source_dir'].lower().startswith('\\\\wsl')
@@ -470,46 +1310,222 @@ def run_backup_job(job_details, global_settings, log_queue):
     zip_ok = False
     if copy_ok:
         update_status(2, "Zipping files...")
-        zip_ok = create_zip_archive(job_details, temp_copy_dir, zip_file, log_queue)
+        with trace_span(job_name, "compress", run_record) as span:
+            zip_ok = create_zip_archive(job_details, temp_copy_dir, zip_file, log_queue)
+            span["ok"] = zip_ok
+        with trace_span(job_name, "verify", run_record) as span:
+            archive_bytes = os.path.getsize(zip_file) if os.path.exists(zip_file) else 0
+            span["archive_bytes"] = archive_bytes
+            span["ok"] = zip_ok and archive_bytes > 0
+        run_record["archive_path"] = zip_file
+        run_record["archive_bytes"] = archive_bytes
     else:
         log_queue.put(f"[{job_name}] Skipping zip due to file copy failure.")
         update_status(2, "Skipping zip...")
 
     update_status(3, "Cleaning temp files...")
-    if os.path.exists(temp_copy_dir): cleanup_temp_dir(job_details, temp_copy_dir, log_queue)
-    else: log_queue.put(f"[{job_name}] Temp dir doesn't exist.")
+    with trace_span(job_name, "cleanup", run_record):
+        if os.path.exists(temp_copy_dir): cleanup_temp_dir(job_details, temp_copy_dir, log_queue)
+        else: log_queue.put(f"[{job_name}] Temp dir doesn't exist.")
+    return copy_ok, zip_ok
+
+def _run_streaming_stages(job_details, backup_folder, log_queue, run_record, update_status, shared_pass=None):
+    """Scan, read and compress in one bounded pipeline (see section 3.5). Returns (copy_ok, zip_ok)."""
+    job_name = job_details['name']
+    archive_file = os.path.join(backup_folder, f"{job_name}_{run_record['timestamp']}.tar.gz")
+    manifest_path = os.path.join(RUNS_DIR, f"{run_record['run_id']}.manifest.sqlite")
+
+    update_status(1, "Streaming files to archive...")
+    copy_stats = {"files": 0, "bytes": 0}
+    with trace_span(job_name, "archive", run_record) as span:
+        if shared_pass:
+            archive_ok = shared_pass.stream(job_details, archive_file, manifest_path, log_queue, copy_stats)
+        else:
+            archive_ok = stream_archive(job_details, archive_file, manifest_path, log_queue, copy_stats)
+        span["ok"] = archive_ok
+        span["shared"] = shared_pass is not None
+        span.update(copy_stats)
+    run_record["files_processed"] = copy_stats["files"]
+    run_record["bytes_processed"] = copy_stats["bytes"]
+    if archive_ok: run_record["manifest_path"] = manifest_path
+    else: remove_run_manifest(manifest_path)
+
+    update_status(2, "Verifying archive...")
+    with trace_span(job_name, "verify", run_record) as span:
+        archive_bytes = os.path.getsize(archive_file) if os.path.exists(archive_file) else 0
+        span["archive_bytes"] = archive_bytes
+        span["ok"] = archive_ok and archive_bytes > 0
+    run_record["archive_path"] = archive_file
+    run_record["archive_bytes"] = archive_bytes
+    update_status(3, "No temp files to clean.")
+    return archive_ok, archive_ok and archive_bytes > 0
+
+def _execute_backup_job(job_details, global_settings, log_queue, run_record, shared_pass=None):
+    job_name = job_details['name']
+    total_steps = 4
+    def update_status(step, message=""): log_queue.put(("status", job_name, step, total_steps, message))
+    update_status(0, "Starting...")
+    if not job_details.get('enabled', False):
+        log_queue.put(f"[{job_name}] SKIPPED: Job is disabled.")
+        run_record["skipped"] = True
+        update_status(0, "Skipped (Disabled)"); return
+
+    backup_folder = job_details['destination_base']
+
+    retention_policy = get_retention_policy(job_details, global_settings)
+    job_specific_volumes = job_details.get("volumes_to_keep_override")
+    if retention_policy:
+        volumes_to_keep = None
+        log_queue.put(f"[{job_name}] Using tiered retention: {format_retention_spec(retention_policy)}.")
+    elif job_specific_volumes is not None and job_specific_volumes > 0:
+        volumes_to_keep = job_specific_volumes
+        log_queue.put(f"[{job_name}] Using job-specific retention: {volumes_to_keep} backups.")
+    else:
+        volumes_to_keep = global_settings.get('default_volumes_to_keep', 3)
+        log_queue.put(f"[{job_name}] Using global retention (defaulting to {volumes_to_keep} backups).")
+
+    os.makedirs(backup_folder, exist_ok=True)
+    if job_details.get('engine', 'classic') == 'streaming':
+        copy_ok, zip_ok = _run_streaming_stages(job_details, backup_folder, log_queue, run_record, update_status, shared_pass)
+    else:
+        copy_ok, zip_ok = _run_classic_stages(job_details, backup_folder, log_queue, run_record, update_status)
 
     update_status(4, "Cleaning old backups...")
-    if zip_ok: perform_cleanup(job_details, volumes_to_keep, log_queue)
+    if copy_ok and zip_ok: record_snapshot(run_record, log_queue)
+    if zip_ok:
+        with trace_span(job_name, "rotation", run_record):
+            if retention_policy:
+                try: apply_retention(job_details, retention_policy, log_queue)
+                except Exception as e: log_queue.put(f"[{job_name}] ERROR during tiered retention: {e}")
+            else: perform_cleanup(job_details, volumes_to_keep, log_queue)
     else: log_queue.put(f"[{job_name}] Skipping rotation.")
 
+    run_record["success"] = copy_ok and zip_ok
     if copy_ok and zip_ok:
         log_queue.put(f"--- Job: {job_name} COMPLETED SUCCESSFULLY ---"); update_status(0, "Finished Successfully!")
     else:
         log_queue.put(f"--- Job: {job_name} FAILED ---"); update_status(0, "Finished with Errors!")
+
+# cProfile is process-wide from Python 3.12 (sys.monitoring) and a second enable() raises,
+# so only one job at a time may use it; the others fall back to the sampling profiler.
+_cprofile_lock = threading.Lock()
+
+def _start_profiler(profile_mode, job_name, log_queue):
+    """Starts the requested profiler and returns (mode actually used, profiler or None).
+    Never raises: profiling must not stop the backup itself."""
+    if profile_mode == "cprofile":
+        if _cprofile_lock.acquire(blocking=False):
+            try:
+                profiler = cProfile.Profile()
+                profiler.enable()
+                return "cprofile", profiler
+            except Exception as e:
+                _cprofile_lock.release()
+                log_queue.put(f"[{job_name}] WARNING: cProfile unavailable ({e}); using the sampling profiler.")
+        else:
+            log_queue.put(f"[{job_name}] WARNING: Another job is using cProfile; using the sampling profiler.")
+        profile_mode = "sampling"
+    if profile_mode == "sampling":
+        try:
+            profiler = SamplingProfiler(threading.get_ident())
+            profiler.start()
+            return "sampling", profiler
+        except Exception as e:
+            log_queue.put(f"[{job_name}] WARNING: Could not start the sampling profiler: {e}")
+    return "off", None
+
+def _stop_profiler(profile_mode, profiler, profile_base, job_name, log_queue):
+    """Stops the profiler and saves its output; returns the profile path, or None."""
+    if profiler is None: return None
+    try:
+        if profile_mode == "cprofile":
+            try: profiler.disable()
+            finally: _cprofile_lock.release()
+            path = f"{profile_base}.prof"
+            profiler.dump_stats(path)
+        else:
+            profiler.stop()
+            path = f"{profile_base}.collapsed.txt"
+            profiler.save(path)
+        return path
+    except Exception as e:
+        log_queue.put(f"[{job_name}] WARNING: Could not save profile: {e}")
+        return None
+
+def run_backup_job(job_details, global_settings, log_queue, shared_pass=None):
+    """Runs one backup job, optionally under a profiler (job key 'profile': off/cprofile/sampling),
+    and saves a run record (plus any profile) to Debug/Runs. `shared_pass` is set when the job
+    takes part in a SharedStreamPass with other jobs started at the same time."""
+    job_name = job_details['name']
+    run_record = new_run_record(job_details)
+    profile_mode = run_record["profile"] if run_record["profile"] in PROFILE_MODES else "off"
+    profile_base = os.path.join(RUNS_DIR, run_record['run_id'])
+    log_queue.put(("job_started", job_name))
+    start = time.perf_counter()
+    rss_monitor = None
+    # Everything after this point is inside the try, so a shared pass is always left even if setup fails.
+    try:
+        rss_monitor = PeakRssMonitor()
+        rss_monitor.start()
+        profile_mode, profiler = _start_profiler(profile_mode, job_name, log_queue)
+        run_record["profile"] = profile_mode
+        with trace_span(job_name, "job", run_record, profile=profile_mode) as span:
+            try: _execute_backup_job(job_details, global_settings, log_queue, run_record, shared_pass)
+            finally: run_record["profile_path"] = _stop_profiler(profile_mode, profiler, profile_base, job_name, log_queue)
+            span["ok"] = run_record["success"]
+    except Exception as e:
+        log_queue.put(f"[{job_name}] CRITICAL ERROR: Unexpected failure: {e}")
+        log_queue.put(f"--- Job: {job_name} FAILED ---")
+    finally:
+        if shared_pass: shared_pass.leave(job_name)
+        run_record["finished_at"] = datetime.now().isoformat(timespec='seconds')
+        run_record["duration_seconds"] = round(time.perf_counter() - start, 3)
+        if rss_monitor: rss_monitor.stop()
+        run_record["peak_rss_bytes"] = rss_monitor.peak if rss_monitor else None
+        if run_record["peak_rss_bytes"] and not run_record.get("skipped"):
+            log_queue.put(f"[{job_name}] Peak memory (RSS) during run: {run_record['peak_rss_bytes'] / (1024 * 1024):.1f} MB")
+        if not run_record.get("skipped"): save_run_record(run_record, log_queue)
+        log_queue.put(("job_result", job_name, run_record))
+        if run_record["profile_path"]: log_queue.put(f"[{job_name}] Profile saved: {run_record['profile_path']}")
     time.sleep(2)
     log_queue.put(("status", "Idle", 0, 4, ""))
 
 # ==============================================================================
-# 4. SCHEDULER LOGIC (Unchanged)
+# 4. SCHEDULER LOGIC
 # ==============================================================================
 scheduler = None
+# Triggers that fire within this window are started together, so overlapping streaming jobs can share a read pass.
+SCHEDULE_BATCH_WINDOW_SECONDS = 2
 if APS_AVAILABLE:
     scheduler = BackgroundScheduler(daemon=True)
+    _scheduled_batch = []
+    _scheduled_batch_lock = threading.Lock()
+
+    def _start_scheduled_batch(global_settings, log_queue):
+        with _scheduled_batch_lock:
+            jobs = list(_scheduled_batch); _scheduled_batch.clear()
+        if not scheduler.running:
+            logging.info(f"Scheduler stopped; dropping {len(jobs)} pending scheduled job(s)."); return
+        start_backup_jobs(jobs, global_settings, log_queue)
+
     def schedule_trigger_backup(job_details, global_settings, log_queue):
         log_queue.put(f"SCHEDULER: Triggered backup for {job_details['name']}.")
-        threading.Thread(target=run_backup_job, args=(job_details, global_settings, log_queue),
-                         daemon=True, name=f"Backup-{job_details['name']}").start()
-
-    def parse_and_add_job_to_scheduler(job_details, global_settings, log_queue):
+        with _scheduled_batch_lock:
+            _scheduled_batch.append(job_details)
+            if len(_scheduled_batch) == 1:
+                timer = threading.Timer(SCHEDULE_BATCH_WINDOW_SECONDS, _start_scheduled_batch, args=(global_settings, log_queue))
+                timer.daemon = True  # Must not keep the process alive after the window closes.
+                timer.start()
+
+    def parse_and_add_job_to_scheduler(job_details, global_settings, log_queue, replace=True):
+        """Adds/replaces the single scheduler entry for this job, keyed by its stable ID."""
         if not scheduler: return
-        job_id = job_details['name']
+        job_id = job_details.get('id', job_details['name']); job_name = job_details['name']
         schedule_str = job_details.get('schedule', 'manual').lower().strip()
         is_enabled = job_details.get('enabled', False)
-        try: scheduler.remove_job(job_id)
-        except Exception: pass
+        if replace: remove_job_from_scheduler(job_id)
         if not is_enabled or schedule_str == 'manual':
-            logging.info(f"Job '{job_id}' disabled/manual, not scheduling."); return
+            logging.info(f"Job '{job_name}' disabled/manual, not scheduling."); return
         trigger = None
         try:
             if schedule_str.startswith('daily@'):
@@ -521,30 +1537,133 @@ if APS_AVAILABLE:
             elif schedule_str.startswith('weekly@'):
                 parts = schedule_str.split('@')[1].split(':'); d=parts[0][:3].lower();h=int(parts[1]);m=int(parts[2])
                 trigger = CronTrigger(day_of_week=d, hour=h, minute=m)
-            else: logging.warning(f"Bad schedule: '{schedule_str}' for '{job_id}'.")
-            if trigger: logging.info(f"Scheduling '{job_id}': {trigger}.")
-            else: log_queue.put(f"WARNING: No valid trigger for '{job_id}', schedule '{schedule_str}'.")
+            else: logging.warning(f"Bad schedule: '{schedule_str}' for '{job_name}'.")
+            if trigger: logging.info(f"Scheduling '{job_name}': {trigger}.")
+            else: log_queue.put(f"WARNING: No valid trigger for '{job_name}', schedule '{schedule_str}'.")
         except Exception as e:
-            logging.error(f"Error parsing schedule '{schedule_str}' for '{job_id}': {e}")
-            log_queue.put(f"ERROR: Invalid schedule '{schedule_str}' for {job_id}.")
+            logging.error(f"Error parsing schedule '{schedule_str}' for '{job_name}': {e}")
+            log_queue.put(f"ERROR: Invalid schedule '{schedule_str}' for {job_name}.")
         if trigger:
-            scheduler.add_job(schedule_trigger_backup, trigger, id=job_id, name=job_id,
+            scheduler.add_job(schedule_trigger_backup, trigger, id=job_id, name=job_name,
                               args=[job_details, global_settings, log_queue],
                               replace_existing=True, misfire_grace_time=3600)
-            log_queue.put(f"Job '{job_id}' scheduled.")
+            log_queue.put(f"Job '{job_name}' scheduled.")
+
+    def remove_job_from_scheduler(job_id):
+        if not scheduler: return
+        try: scheduler.remove_job(job_id)
+        except Exception: pass
 
     def load_all_jobs_to_scheduler(config, log_queue):
+        """Initial load only; later edits go through parse_and_add_job_to_scheduler for the one job."""
         if not scheduler: return
         log_queue.put("Loading jobs into scheduler...")
         if 'backup_jobs' in config and 'global_settings' in config:
             for job in config['backup_jobs']:
-                parse_and_add_job_to_scheduler(job, config['global_settings'], log_queue)
+                parse_and_add_job_to_scheduler(job, config['global_settings'], log_queue, replace=False)
         log_stream = io.StringIO()
         scheduler.print_jobs(out=log_stream)
         logging.info(f"APScheduler jobs:\n{log_stream.getvalue()}")
         log_stream.close()
 
 
+# ==============================================================================
+# 4.5 METRICS ENDPOINT (Optional)
+# ==============================================================================
+def _prom_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class JobMetrics:
+    """Aggregates the structured job events that flow through log_queue into
+    Prometheus-style counters and gauges. Fed from the UI thread, read by the
+    metrics HTTP thread."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.jobs = {}
+        self.running = {}
+
+    def observe(self, message):
+        msg_type = message[0]
+        if msg_type == "job_started":
+            with self._lock: self.running[message[1]] = self.running.get(message[1], 0) + 1
+        elif msg_type == "job_result":
+            _, job_name, record = message
+            now = time.time()
+            with self._lock:
+                self.running[job_name] = max(self.running.get(job_name, 0) - 1, 0)
+                if record.get("skipped"): return
+                m = self.jobs.setdefault(job_name, {"runs_success": 0, "runs_failure": 0, "bytes_total": 0, "files_total": 0})
+                duration = record.get("duration_seconds") or 0
+                m["last_duration_seconds"] = duration
+                m["last_bytes"] = record.get("bytes_processed", 0)
+                m["last_files"] = record.get("files_processed", 0)
+                m["last_throughput"] = m["last_bytes"] / duration if duration > 0 else 0
+                m["bytes_total"] += m["last_bytes"]; m["files_total"] += m["last_files"]
+                m["last_run_timestamp"] = now
+                if record.get("peak_rss_bytes"): m["last_peak_rss_bytes"] = record["peak_rss_bytes"]
+                m["last_run_success"] = 1 if record.get("success") else 0
+                if record.get("copy_exit_code") is not None: m["last_copy_exit_code"] = record["copy_exit_code"]
+                if record.get("success"):
+                    m["runs_success"] += 1; m["last_success_timestamp"] = now
+                else: m["runs_failure"] += 1
+
+    def render(self, log_queue=None):
+        lines = []
+        def add(name, mtype, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}"); lines.append(f"# TYPE {name} {mtype}")
+            for labels, value in samples:
+                label_str = ",".join(f'{k}="{_prom_label(v)}"' for k, v in labels.items())
+                lines.append(f"{name}{{{label_str}}} {value}" if label_str else f"{name} {value}")
+        def per_job(key):
+            return [({"job": name}, m[key]) for name, m in sorted(self.jobs.items()) if m.get(key) is not None]
+
+        with self._lock:
+            add("backup_suite_job_last_duration_seconds", "gauge", "Duration of the last run.", per_job("last_duration_seconds"))
+            add("backup_suite_job_last_bytes_processed", "gauge", "Bytes copied by the last run.", per_job("last_bytes"))
+            add("backup_suite_job_last_files_processed", "gauge", "Files copied by the last run.", per_job("last_files"))
+            add("backup_suite_job_last_throughput_bytes_per_second", "gauge", "Copy throughput of the last run.", per_job("last_throughput"))
+            add("backup_suite_job_bytes_processed_total", "counter", "Bytes copied across all runs.", per_job("bytes_total"))
+            add("backup_suite_job_files_processed_total", "counter", "Files copied across all runs.", per_job("files_total"))
+            add("backup_suite_job_last_peak_rss_bytes", "gauge", "Peak process RSS sampled during the last run.", per_job("last_peak_rss_bytes"))
+            add("backup_suite_job_last_run_timestamp_seconds", "gauge", "Unix time the last run finished.", per_job("last_run_timestamp"))
+            add("backup_suite_job_last_success_timestamp_seconds", "gauge", "Unix time of the last successful run.", per_job("last_success_timestamp"))
+            add("backup_suite_job_last_run_success", "gauge", "1 if the last run succeeded, else 0.", per_job("last_run_success"))
+            add("backup_suite_job_last_copy_exit_code", "gauge", "Robocopy/rsync exit code of the last run.", per_job("last_copy_exit_code"))
+            add("backup_suite_job_runs_total", "counter", "Finished runs by result.",
+                [({"job": name, "result": result}, m[f"runs_{result}"]) for name, m in sorted(self.jobs.items()) for result in ("success", "failure")])
+            add("backup_suite_job_running", "gauge", "Runs of this job currently in progress.", [({"job": n}, c) for n, c in sorted(self.running.items())])
+        if log_queue is not None:
+            add("backup_suite_event_queue_depth", "gauge", "Events waiting in the UI log queue.", [({}, log_queue.qsize())])
+        next_runs = []
+        if APS_AVAILABLE and scheduler and scheduler.running:
+            for job in scheduler.get_jobs():
+                if job.next_run_time: next_runs.append(({"job": job.name}, job.next_run_time.timestamp()))
+        add("backup_suite_job_next_run_timestamp_seconds", "gauge", "Unix time of the next scheduled run.", next_runs)
+        return "\n".join(lines) + "\n"
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ("/", "/metrics"):
+            self.send_error(404); return
+        try: body = self.server.render_metrics().encode('utf-8')
+        except Exception as e:
+            logging.error(f"Failed to render metrics: {e}"); self.send_error(500); return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args): logging.debug(f"Metrics request: {format % args}")
+
+def start_metrics_server(metrics, log_queue, bind_address, port):
+    server = ThreadingHTTPServer((bind_address, port), MetricsRequestHandler)
+    server.daemon_threads = True
+    server.render_metrics = lambda: metrics.render(log_queue)
+    threading.Thread(target=server.serve_forever, daemon=True, name="MetricsServer").start()
+    logging.info(f"Metrics endpoint listening on http://{bind_address}:{port}/metrics")
+    return server
+
 # ==============================================================================
 # 5. SYSTEM TRAY ICON (Unchanged)
 # ==============================================================================
@@ -561,17 +1680,18 @@ def create_image(width, height, color1, color2):
 # ==============================================================================
 
 class JobEditorWindow(tk.Toplevel):
-    def __init__(self, parent, job_data=None, original_job_name=None):
+    def __init__(self, parent, job_data=None):
         super().__init__(parent)
-        self.parent = parent; self.job_data_to_edit = job_data; self.original_job_name = original_job_name
-        self.title("Add/Edit Backup Job"); self.geometry("650x600"); self.transient(parent); self.grab_set()
+        self.parent = parent; self.job_data_to_edit = job_data
+        self.title("Add/Edit Backup Job"); self.geometry("650x720"); self.transient(parent); self.grab_set()
         
         theme = current_theme_colors
         self.configure(bg=theme["BG_COLOR"])
 
         self.job_name_var = tk.StringVar(); self.source_dir_var = tk.StringVar(); self.dest_base_var = tk.StringVar()
         self.enabled_var = tk.BooleanVar(value=True); self.schedule_var = tk.StringVar(value="manual")
-        self.volumes_override_var = tk.IntVar(value=0)
+        self.volumes_override_var = tk.IntVar(value=0); self.retention_var = tk.StringVar(); self.profile_var = tk.StringVar(value="off")
+        self.engine_var = tk.StringVar(value="classic")
         main_frame = ttk.Frame(self, padding="15"); main_frame.pack(fill=tk.BOTH, expand=True)
 
         row_num = 0; pady_val = 6; padx_val = 5
@@ -607,6 +1727,11 @@ class JobEditorWindow(tk.Toplevel):
         self.volumes_override_spinbox.grid(row=row_num, column=1, sticky=tk.W, pady=pady_val, padx=padx_val)
         ttk.Label(main_frame, text="(0 = use global default)").grid(row=row_num, column=2, sticky=tk.W, padx=padx_val, pady=pady_val); row_num += 1
 
+        ttk.Label(main_frame, text="Retention Tiers:").grid(row=row_num, column=0, sticky=tk.W, pady=pady_val)
+        self.retention_entry = ttk.Entry(main_frame, textvariable=self.retention_var, width=40)
+        self.retention_entry.grid(row=row_num, column=1, sticky=tk.EW, pady=pady_val, padx=padx_val)
+        ttk.Label(main_frame, text="(e.g. hourly=24, daily=7, weekly=4)").grid(row=row_num, column=2, sticky=tk.W, padx=padx_val, pady=pady_val); row_num += 1
+
         self.enabled_check = ttk.Checkbutton(main_frame, text="Enabled", variable=self.enabled_var)
         self.enabled_check.grid(row=row_num, column=1, sticky=tk.W, pady=pady_val, padx=padx_val); row_num += 1
 
@@ -614,6 +1739,16 @@ class JobEditorWindow(tk.Toplevel):
         self.schedule_entry = ttk.Entry(main_frame, textvariable=self.schedule_var, width=30)
         self.schedule_entry.grid(row=row_num, column=1, columnspan=2, sticky=tk.EW, pady=pady_val, padx=padx_val); row_num += 1
 
+        ttk.Label(main_frame, text="Copy Engine:").grid(row=row_num, column=0, sticky=tk.W, pady=pady_val)
+        self.engine_combo = ttk.Combobox(main_frame, textvariable=self.engine_var, values=ENGINES, state="readonly", width=12)
+        self.engine_combo.grid(row=row_num, column=1, sticky=tk.W, pady=pady_val, padx=padx_val)
+        ttk.Label(main_frame, text="(streaming = constant memory, .tar.gz)").grid(row=row_num, column=2, sticky=tk.W, padx=padx_val, pady=pady_val); row_num += 1
+
+        ttk.Label(main_frame, text="Profile Runs:").grid(row=row_num, column=0, sticky=tk.W, pady=pady_val)
+        self.profile_combo = ttk.Combobox(main_frame, textvariable=self.profile_var, values=PROFILE_MODES, state="readonly", width=12)
+        self.profile_combo.grid(row=row_num, column=1, sticky=tk.W, pady=pady_val, padx=padx_val)
+        ttk.Label(main_frame, text="(saved to Debug/Runs)").grid(row=row_num, column=2, sticky=tk.W, padx=padx_val, pady=pady_val); row_num += 1
+
         ttk.Separator(main_frame, orient=tk.HORIZONTAL).grid(row=row_num, column=0, columnspan=3, pady=(15, 10), sticky=tk.EW); row_num += 1
 
         buttons_frame = ttk.Frame(main_frame); buttons_frame.grid(row=row_num, column=0, columnspan=3, pady=10, sticky=tk.E)
@@ -623,13 +1758,16 @@ class JobEditorWindow(tk.Toplevel):
         if self.job_data_to_edit: self._populate_fields()
         main_frame.columnconfigure(1, weight=1); main_frame.rowconfigure(3, weight=1)
 
-    def _populate_fields(self): # Unchanged
+    def _populate_fields(self):
         self.job_name_var.set(self.job_data_to_edit.get("name", ""))
         self.source_dir_var.set(self.job_data_to_edit.get("source_dir", ""))
         self.dest_base_var.set(self.job_data_to_edit.get("destination_base", ""))
         self.enabled_var.set(self.job_data_to_edit.get("enabled", True))
         self.schedule_var.set(self.job_data_to_edit.get("schedule", "manual"))
         self.volumes_override_var.set(self.job_data_to_edit.get("volumes_to_keep_override", 0))
+        self.profile_var.set(self.job_data_to_edit.get("profile", "off"))
+        self.retention_var.set(format_retention_spec(self.job_data_to_edit.get("retention")))
+        self.engine_var.set(self.job_data_to_edit.get("engine", "classic"))
         self.exclusions_text.delete("1.0", tk.END)
         self.exclusions_text.insert("1.0", "\n".join(self.job_data_to_edit.get("exclusions", [])))
 
@@ -641,16 +1779,18 @@ class JobEditorWindow(tk.Toplevel):
         d = filedialog.askdirectory(title="Select Destination Base Directory", parent=self)
         if d: self.dest_base_var.set(d)
 
-    def _save_job(self): # Unchanged
+    def _save_job(self):
         job_name = self.job_name_var.get().strip(); source_dir = self.source_dir_var.get().strip(); dest_base = self.dest_base_var.get().strip()
         if not all([job_name, source_dir, dest_base]): messagebox.showerror("Error", "Name, Source, & Dest cannot be empty.", parent=self); return
-        is_new = self.job_data_to_edit is None; name_changed = not is_new and self.original_job_name != job_name
-        if (is_new or name_changed) and any(j['name'] == job_name for j in current_config['backup_jobs']):
+        existing = job_registry.find_by_name(job_name)
+        if existing and (self.job_data_to_edit is None or existing['id'] != self.job_data_to_edit['id']):
             messagebox.showerror("Error", f"Job name '{job_name}' already exists.", parent=self); return
 
         exclusions = [ln.strip() for ln in self.exclusions_text.get("1.0",tk.END).strip().splitlines() if ln.strip()]
         details = {"name":job_name, "source_dir":source_dir, "destination_base":dest_base, "exclusions":exclusions,
                    "enabled":self.enabled_var.get(), "schedule":self.schedule_var.get().strip() or "manual"}
+        if self.profile_var.get() != "off": details["profile"] = self.profile_var.get()
+        if self.engine_var.get() != "classic": details["engine"] = self.engine_var.get()
 
         try:
             volumes_override_val = self.volumes_override_var.get()
@@ -661,27 +1801,31 @@ class JobEditorWindow(tk.Toplevel):
         except tk.TclError:
             messagebox.showerror("Validation Error", "Job-specific volumes to keep must be a whole number.", parent=self); return
 
-        if self.job_data_to_edit:
-            current_config['backup_jobs']=[details if j['name']==self.original_job_name else j for j in current_config['backup_jobs']]
-        else: current_config['backup_jobs'].append(details)
+        try: retention = parse_retention_spec(self.retention_var.get())
+        except ValueError as e: messagebox.showerror("Validation Error", f"Retention tiers: {e}", parent=self); return
+        if retention: details["retention"] = retention
+
+        if self.job_data_to_edit: saved = job_registry.update(self.job_data_to_edit['id'], details)
+        else: saved = job_registry.add(details)
 
-        if save_config(current_config):
-            if APS_AVAILABLE: parse_and_add_job_to_scheduler(details, current_config['global_settings'], main_app_ref.log_queue)
+        if saved:
+            if APS_AVAILABLE: parse_and_add_job_to_scheduler(saved, current_config['global_settings'], main_app_ref.log_queue)
             messagebox.showinfo("Success", "Job saved.", parent=self)
-            if main_app_ref: main_app_ref.populate_job_list()
+            if main_app_ref: main_app_ref.refresh_job_row(saved['id'])
+            if not job_registry.snapshot_ok: messagebox.showwarning("Warning", CONFIG_SNAPSHOT_WARNING, parent=self)
             self.destroy()
         else: messagebox.showerror("Error", "Failed to save config.", parent=self)
 
 class SettingsWindow(tk.Toplevel):
     def __init__(self, parent):
         super().__init__(parent)
-        self.parent=parent; self.title("Global Settings"); self.geometry("500x320"); self.transient(parent); self.grab_set()
+        self.parent=parent; self.title("Global Settings"); self.geometry("560x420"); self.transient(parent); self.grab_set()
         
         theme = current_theme_colors
         self.configure(bg=theme["BG_COLOR"])
 
         self.volumes_var=tk.IntVar(); self.base_name_var=tk.StringVar(); self.start_with_windows_var=tk.BooleanVar()
-        self.theme_var = tk.StringVar()
+        self.retention_var = tk.StringVar(); self.theme_var = tk.StringVar(); self.metrics_enabled_var = tk.BooleanVar(); self.metrics_port_var = tk.IntVar()
 
         main_frame = ttk.Frame(self, padding="20"); main_frame.pack(fill=tk.BOTH, expand=True)
         row_num = 0; pady_val = 8; padx_val = 5
@@ -690,6 +1834,10 @@ class SettingsWindow(tk.Toplevel):
         self.volumes_spinbox = ttk.Spinbox(main_frame,from_=1,to=100,textvariable=self.volumes_var,width=10)
         self.volumes_spinbox.grid(row=row_num,column=1,sticky=tk.W,pady=pady_val, padx=padx_val); row_num+=1
 
+        ttk.Label(main_frame,text="Default Retention Tiers:").grid(row=row_num,column=0,sticky=tk.W,pady=pady_val)
+        self.retention_entry = ttk.Entry(main_frame,textvariable=self.retention_var,width=35)
+        self.retention_entry.grid(row=row_num,column=1,sticky=tk.EW,pady=pady_val, padx=padx_val); row_num+=1
+
         ttk.Label(main_frame,text="Default Backup Base Name:").grid(row=row_num,column=0,sticky=tk.W,pady=pady_val)
         self.base_name_entry = ttk.Entry(main_frame,textvariable=self.base_name_var,width=35)
         self.base_name_entry.grid(row=row_num,column=1,sticky=tk.EW,pady=pady_val, padx=padx_val); row_num+=1
@@ -701,6 +1849,11 @@ class SettingsWindow(tk.Toplevel):
         self.start_with_windows_check = ttk.Checkbutton(main_frame,text="Start application when Windows starts",variable=self.start_with_windows_var)
         self.start_with_windows_check.grid(row=row_num,column=0,columnspan=2,sticky=tk.W,pady=15); row_num+=1
 
+        self.metrics_check = ttk.Checkbutton(main_frame,text="Serve Prometheus metrics on port:",variable=self.metrics_enabled_var)
+        self.metrics_check.grid(row=row_num,column=0,sticky=tk.W,pady=pady_val)
+        self.metrics_port_spinbox = ttk.Spinbox(main_frame,from_=1024,to=65535,textvariable=self.metrics_port_var,width=10)
+        self.metrics_port_spinbox.grid(row=row_num,column=1,sticky=tk.W,pady=pady_val, padx=padx_val); row_num+=1
+
         ttk.Separator(main_frame, orient=tk.HORIZONTAL).grid(row=row_num, column=0, columnspan=2, pady=(15, 10), sticky=tk.EW); row_num += 1
 
         buttons_frame = ttk.Frame(main_frame); buttons_frame.grid(row=row_num,column=0,columnspan=2,pady=15, sticky=tk.E)
@@ -713,22 +1866,36 @@ class SettingsWindow(tk.Toplevel):
         settings = current_config.get('global_settings',{})
         self.volumes_var.set(settings.get("default_volumes_to_keep",3))
         self.base_name_var.set(settings.get("default_backup_base_name","Backups_Py"))
+        self.retention_var.set(format_retention_spec(settings.get("default_retention")))
         self.start_with_windows_var.set(check_if_in_startup())
         self.theme_var.set(settings.get("theme", "Light (Default)"))
+        self.metrics_enabled_var.set(settings.get("metrics_enabled", False))
+        self.metrics_port_var.set(settings.get("metrics_port", DEFAULT_METRICS_PORT))
 
     def _save_settings(self):
         try: volumes = self.volumes_var.get(); assert volumes >= 1
         except: messagebox.showerror("Error","Volumes must be >= 1.",parent=self); return
         base_name = self.base_name_var.get().strip()
         if not base_name: messagebox.showerror("Error","Base Name empty.",parent=self); return
+        try: retention = parse_retention_spec(self.retention_var.get())
+        except ValueError as e: messagebox.showerror("Error",f"Retention tiers: {e}",parent=self); return
+        try: metrics_port = self.metrics_port_var.get(); assert 1024 <= metrics_port <= 65535
+        except: messagebox.showerror("Error","Metrics port must be between 1024 and 65535.",parent=self); return
 
         current_config['global_settings']['default_volumes_to_keep']=volumes
         current_config['global_settings']['default_backup_base_name']=base_name
+        if retention: current_config['global_settings']['default_retention']=retention
+        else: current_config['global_settings'].pop('default_retention', None)
         
         selected_theme = self.theme_var.get()
         current_theme = current_config['global_settings'].get("theme", "Light (Default)")
         current_config['global_settings']['theme'] = selected_theme
 
+        metrics_changed = (current_config['global_settings'].get('metrics_enabled', False) != self.metrics_enabled_var.get()
+                           or current_config['global_settings'].get('metrics_port', DEFAULT_METRICS_PORT) != metrics_port)
+        current_config['global_settings']['metrics_enabled'] = self.metrics_enabled_var.get()
+        current_config['global_settings']['metrics_port'] = metrics_port
+
         current_startup = check_if_in_startup(); desired_startup = self.start_with_windows_var.get()
         startup_ok = True
         if desired_startup and not current_startup:
@@ -736,12 +1903,15 @@ class SettingsWindow(tk.Toplevel):
         elif not desired_startup and current_startup:
             if not remove_from_startup(): startup_ok=False; messagebox.showerror("Error","Failed to remove from startup.",parent=self); self.start_with_windows_var.set(True)
             
-        if save_config(current_config) and startup_ok:
+        if job_registry.save_settings() and startup_ok:
             messagebox.showinfo("Success","Settings saved.",parent=self)
             if main_app_ref:
                 main_app_ref.log_message_gui("Global settings updated.")
                 if current_theme != selected_theme:
                     main_app_ref.apply_theme(selected_theme)
+                if metrics_changed:
+                    main_app_ref.configure_metrics_server()
+            if not job_registry.snapshot_ok: messagebox.showwarning("Warning", CONFIG_SNAPSHOT_WARNING, parent=self)
             self.destroy()
         elif not startup_ok: pass
         else: messagebox.showerror("Error","Failed to save config file.",parent=self)
@@ -761,9 +1931,13 @@ class BackupApp:
 
         self.log_queue = queue.Queue()
         self.tray_icon = None
+        self.metrics = JobMetrics()
+        self.metrics_server = None
 
-        global current_config
+        global current_config, job_registry
         current_config = load_config()
+        job_registry = JobRegistry(current_config) # Listbox rows mirror the registry's job order
+        backfill_catalog_job_ids(job_registry.jobs())
         initial_theme = current_config.get("global_settings", {}).get("theme", "Light (Default)")
 
         self.create_widgets()
@@ -782,6 +1956,8 @@ class BackupApp:
         else:
             self.log_message_gui("Scheduler disabled.")
 
+        self.configure_metrics_server()
+
         if TRAY_AVAILABLE:
             self.setup_tray_icon()
             self.root.protocol("WM_DELETE_WINDOW", self.hide_window)
@@ -871,6 +2047,7 @@ class BackupApp:
         self.bottom_frame.pack(fill=tk.X, pady=(0, 5))
         ttk.Button(self.bottom_frame, text="Run Selected", command=self.run_selected_backup).pack(side=tk.LEFT, padx=(5, 5))
         ttk.Button(self.bottom_frame, text="Run All", command=self.run_all_backups).pack(side=tk.LEFT, padx=5)
+        ttk.Button(self.bottom_frame, text="Preview Retention", command=self.preview_retention).pack(side=tk.LEFT, padx=5)
         ttk.Button(self.bottom_frame, text="Settings", command=self.open_settings).pack(side=tk.RIGHT, padx=5)
         ttk.Button(self.bottom_frame, text="View Log File", command=self.view_log_file).pack(side=tk.RIGHT, padx=5)
 
@@ -972,25 +2149,54 @@ class BackupApp:
             logging.error(f"An unexpected error occurred while setting window icon: {e}")
             self.log_message_gui(f"ERROR: Unexpected error setting window icon. Details: {e}")
 
-    def populate_job_list(self):
+    def _format_job_row(self, job):
+        status = " (Enabled)" if job.get('enabled', False) else " (Disabled)"
+        return f"{job['name']}{status} [{job.get('schedule', 'manual')}]"
+
+    def _paint_job_row(self, i):
         theme = current_theme_colors
+        color = theme["LIST_BG"] if i % 2 == 0 else theme["LIST_ALT_BG"]
+        job_listbox.itemconfig(i, {'bg': color, 'fg': theme["TEXT_COLOR"],
+                                  'selectbackground': theme["SELECT_BG"],
+                                  'selectforeground': theme["SELECT_FG"]})
+
+    def populate_job_list(self):
+        """Full rebuild; only used at startup and on theme change. Edits use refresh_job_row/remove_job_row."""
         job_listbox.delete(0, tk.END)
-        if current_config and 'backup_jobs' in current_config:
-            for i, job in enumerate(current_config['backup_jobs']):
-                status = " (Enabled)" if job.get('enabled', False) else " (Disabled)"
-                schedule = job.get('schedule', 'manual')
-                job_listbox.insert(tk.END, f"{job['name']}{status} [{schedule}]")
-                color = theme["LIST_BG"] if i % 2 == 0 else theme["LIST_ALT_BG"]
-                job_listbox.itemconfig(i, {'bg': color, 'fg': theme["TEXT_COLOR"],
-                                          'selectbackground': theme["SELECT_BG"],
-                                          'selectforeground': theme["SELECT_FG"]})
+        jobs = current_config.get('backup_jobs', []) if current_config else []
+        if jobs: job_listbox.insert(tk.END, *[self._format_job_row(job) for job in jobs])
+        for i in range(len(jobs)): self._paint_job_row(i)
         logging.info("Job listbox updated.")
 
-    def process_log_queue(self): # Unchanged
+    def refresh_job_row(self, job_id):
+        """Redraws (or appends) the single row for an added/edited job."""
+        position = job_registry.position(job_id)
+        text = self._format_job_row(job_registry.get(job_id))
+        if position >= job_listbox.size():
+            job_listbox.insert(tk.END, text)
+        else:
+            was_selected = position in job_listbox.curselection()
+            job_listbox.delete(position); job_listbox.insert(position, text)
+            if was_selected: job_listbox.selection_set(position)
+        self._paint_job_row(position)
+
+    def remove_job_row(self, position):
+        job_listbox.delete(position)
+        for i in range(position, job_listbox.size()): self._paint_job_row(i) # Keep the alternating stripes
+        logging.info(f"Job listbox row {position} removed.")
+
+    def selected_job(self):
+        """The job for the selected listbox row, or None (after warning the user)."""
+        try: idx = job_listbox.curselection()[0]
+        except IndexError: messagebox.showwarning("Warning", "Select a job."); return None
+        return current_config['backup_jobs'][idx]
+
+    def process_log_queue(self):
         try:
             while True:
                 message = self.log_queue.get_nowait()
                 if isinstance(message, tuple):
+                    self.metrics.observe(message)
                     msg_type = message[0]
                     if msg_type == "status": _, j, s, t, m = message; self.update_status_bar(j, s, t, m, (s in [1, 2]))
                     elif msg_type == "file_update": _, j, f = message; self.update_status_bar(j, 1, 4, f"Copying: {f}", True)
@@ -1020,53 +2226,70 @@ class BackupApp:
             log_text_widget.see(tk.END); log_text_widget.config(state=tk.DISABLED)
         logging.info(message)
 
+    def configure_metrics_server(self):
+        """(Re)starts or stops the metrics endpoint to match the global settings."""
+        settings = current_config.get('global_settings', {})
+        if self.metrics_server:
+            self.metrics_server.shutdown(); self.metrics_server.server_close(); self.metrics_server = None
+        if not settings.get('metrics_enabled', False): return
+        bind_address = settings.get('metrics_bind_address', '127.0.0.1')
+        port = settings.get('metrics_port', DEFAULT_METRICS_PORT)
+        try:
+            self.metrics_server = start_metrics_server(self.metrics, self.log_queue, bind_address, port)
+            self.log_message_gui(f"Metrics endpoint started on http://{bind_address}:{port}/metrics")
+        except OSError as e:
+            self.log_message_gui(f"ERROR starting metrics endpoint on {bind_address}:{port}: {e}")
+
     def view_log_file(self): # Unchanged
         try: os.startfile(os.path.abspath(LOG_FILE))
         except Exception as e: messagebox.showerror("Error", f"Could not open log file: {e}")
 
     def open_add_job_window(self): JobEditorWindow(self.root) # Unchanged
-    def open_edit_job_window(self): # Unchanged
-        try:
-            idx = job_listbox.curselection()[0]; name = job_listbox.get(idx).split(" (")[0].strip()
-            job = next((j for j in current_config['backup_jobs'] if j['name'] == name), None)
-            if job: JobEditorWindow(self.root, job_data=job, original_job_name=name)
-            else: messagebox.showerror("Error", "Could not find job.")
-        except IndexError: messagebox.showwarning("Warning", "Select a job.")
-
-    def remove_backup_job(self): # Unchanged
-        try:
-            idx = job_listbox.curselection()[0]; name = job_listbox.get(idx).split(" (")[0].strip()
-            if messagebox.askyesno("Confirm", f"Remove '{name}'?"):
-                if APS_AVAILABLE and scheduler:
-                    try: scheduler.remove_job(name)
-                    except: pass
-                current_config['backup_jobs'] = [j for j in current_config['backup_jobs'] if j['name'] != name]
-                if save_config(current_config):
-                    self.log_message_gui(f"Removed '{name}'."); self.populate_job_list()
-                else: messagebox.showerror("Error", "Failed to save config.")
-        except IndexError: messagebox.showwarning("Warning", "Select a job.")
-
-    def run_selected_backup(self): # Unchanged
-        try:
-            idx = job_listbox.curselection()[0]; name = job_listbox.get(idx).split(" (")[0].strip()
-            job = next((j for j in current_config['backup_jobs'] if j['name'] == name), None)
-            if job:
-                if not job.get('enabled'): messagebox.showwarning("Disabled", "Job disabled."); return
-                self.log_message_gui(f"Queueing manual backup: {name}")
-                threading.Thread(target=run_backup_job, args=(job, current_config['global_settings'], self.log_queue),
-                                 daemon=True, name=f"Backup-{name}").start()
-            else: messagebox.showerror("Error", "Could not find job.")
-        except IndexError: messagebox.showwarning("Warning", "Select a job.")
-
-    def run_all_backups(self): # Unchanged
+    def open_edit_job_window(self):
+        job = self.selected_job()
+        if job: JobEditorWindow(self.root, job_data=job)
+
+    def remove_backup_job(self):
+        job = self.selected_job()
+        if not job: return
+        name = job['name']
+        if messagebox.askyesno("Confirm", f"Remove '{name}'?"):
+            position = job_registry.position(job['id'])
+            if APS_AVAILABLE and scheduler: remove_job_from_scheduler(job['id'])
+            if job_registry.remove(job['id']):
+                self.log_message_gui(f"Removed '{name}'."); self.remove_job_row(position)
+                if not job_registry.snapshot_ok: messagebox.showwarning("Warning", CONFIG_SNAPSHOT_WARNING)
+            else: messagebox.showerror("Error", "Failed to save config.")
+
+    def run_selected_backup(self):
+        job = self.selected_job()
+        if not job: return
+        if not job.get('enabled'): messagebox.showwarning("Disabled", "Job disabled."); return
+        self.log_message_gui(f"Queueing manual backup: {job['name']}")
+        threading.Thread(target=run_backup_job, args=(job, current_config['global_settings'], self.log_queue),
+                         daemon=True, name=f"Backup-{job['name']}").start()
+
+    def preview_retention(self):
+        job = self.selected_job()
+        if not job: return
+        name = job['name']
+        policy = get_retention_policy(job, current_config['global_settings'])
+        if not policy:
+            messagebox.showinfo("Retention Preview", f"'{name}' uses 'keep newest N' rotation. Set retention tiers to use the catalog."); return
+        try: keep, prune = apply_retention(job, policy, self.log_queue, dry_run=True)
+        except Exception as e: messagebox.showerror("Error", f"Could not read the snapshot catalog: {e}"); return
+        shown = "\n".join(os.path.basename(row[1]) for row in prune[:20])
+        if len(prune) > 20: shown += f"\n... and {len(prune) - 20} more"
+        messagebox.showinfo("Retention Preview", f"Policy: {format_retention_spec(policy)}\n"
+                            f"Keep: {len(keep)} snapshots\nPrune: {len(prune)} snapshots\n\n{shown}")
+
+    def run_all_backups(self):
         self.log_message_gui("--- Starting 'Run All Backups' ---")
-        jobs = [j for j in current_config['backup_jobs'] if j.get('enabled')]
+        jobs = [j for j in job_registry.jobs() if j.get('enabled')]
         if not jobs: self.log_message_gui("No enabled jobs."); return
         self.log_message_gui(f"Queueing {len(jobs)} jobs...")
-        for job in jobs:
-            self.log_message_gui(f"Queueing: {job['name']}")
-            threading.Thread(target=run_backup_job, args=(job, current_config['global_settings'], self.log_queue),
-                             daemon=True, name=f"Backup-{job['name']}").start()
+        for job in jobs: self.log_message_gui(f"Queueing: {job['name']}")
+        start_backup_jobs(jobs, current_config['global_settings'], self.log_queue)
 
     def open_settings(self): SettingsWindow(self.root) # Unchanged
 
@@ -1102,8 +2325,11 @@ class BackupApp:
              try: self.tray_icon.notify('Running in background', 'Backup Suite')
              except Exception as e: logging.warning(f"Tray notification error: {e}")
 
-    def quit_application(self): # Unchanged
+    def quit_application(self):
         self.log_message_gui("Shutting down...")
+        if self.metrics_server:
+            try: self.metrics_server.shutdown(); self.metrics_server.server_close()
+            except Exception as e: logging.error(f"Error stopping metrics endpoint: {e}")
         if APS_AVAILABLE and scheduler and scheduler.running:
             try: scheduler.shutdown(wait=False)
             except Exception as e: logging.error(f"Error shutting scheduler: {e}")
@@ -1118,6 +2344,7 @@ class BackupApp:
 # ==============================================================================
 if __name__ == "__main__":
     current_config = None
+    job_registry = None
     main_app_ref = None
     job_listbox = None
     log_text_widget = None